@@ -1,19 +1,31 @@
 # scraper/scrape_transport_fc.py
+import asyncio
+import hashlib
 import json
 import os
 import re
+import sqlite3
+import threading
 import time
 from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from io import BytesIO
-from urllib.parse import urlsplit, parse_qs, urljoin, unquote
+from operator import itemgetter
+from urllib.parse import urlsplit, urlunsplit, urljoin, unquote
 
-import requests
-from requests.adapters import HTTPAdapter            
-from urllib3.util.retry import Retry 
-from bs4 import BeautifulSoup as BS
+import aiohttp
+import numpy as np
+from aiolimiter import AsyncLimiter
+from selectolax.lexbor import LexborHTMLParser
 from slugify import slugify
 import pdfplumber
 
+try:
+    import orjson
+except ImportError:  # optional speed-up; the stdlib writes the same bytes
+    orjson = None
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Config
 # ──────────────────────────────────────────────────────────────────────────────
@@ -24,20 +36,6 @@ HEADERS = {
     )
 }
 
-def _build_session():                                 
-    s = requests.Session()
-    retry = Retry(
-        total=3,
-        backoff_factor=0.8,       # 0.8s, 1.6s, 3.2s
-        status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET"]),
-        raise_on_status=False,
-    )
-    s.mount("http://", HTTPAdapter(max_retries=retry))
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    return s
-
-SESSION = _build_session() 
 FC_SUBS = [
     "szz1", "poz2", "poz1", "ktw1", "ktw3", "ktw5",
     "wro1", "wro2", "wro3", "wro4", "wro5",
@@ -70,54 +68,125 @@ LCJ_SEEDS = {
 DATA_DIR = "data"
 DATA_PATH = os.path.join(DATA_DIR, "stops.json")
 CHANGES_PATH = os.path.join(DATA_DIR, "changes.json")
+COORDS_PATH = os.path.join(DATA_DIR, "coords.npy")
 GEOCODE_CACHE_PATH = os.path.join(DATA_DIR, "geocode_cache.json")
+HTTP_CACHE_PATH = os.path.join(DATA_DIR, "http_cache.sqlite")
+PDF_TEXT_CACHE_PATH = os.path.join(DATA_DIR, "pdf_text_cache.json")
 
 DUPLICATE_WRO_BY_FC = False
 
 REQUEST_DELAY_SEC = float(os.getenv("REQUEST_DELAY_SEC", "0.7"))  # NEW
 MAX_PAGES_PER_HOST = 300
 MAX_DEPTH = 2 
+MAX_CONCURRENCY = 16         # requests in flight across all hosts
+PER_HOST_CONCURRENCY = 2     # requests in flight per host
+RETRY_TOTAL = 3
+RETRY_BACKOFF_SEC = 0.8      # 0.8s, 1.6s, 3.2s
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+DNS_CACHE_TTL_SEC = 600
 GEOCODE_DELAY_SEC = float(os.getenv("GEOCODE_DELAY_SEC", "1.1"))
 GEOCODE_ENABLED = os.getenv("GEOCODE_ENABLED", "1") != "0"
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") != "0"
+HTTP_CACHE_TTL_SEC = float(os.getenv("HTTP_CACHE_TTL_SEC", "3600"))  # served without a request
+OSM_PROBE_BYTES = int(os.getenv("OSM_PROBE_BYTES", "262144"))  # 0 = read whole page
+# never scanned for OSM links
+NON_HTML_TYPES = ("image/", "audio/", "video/", "font/", "application/pdf", "application/zip")
+NON_HTML_EXTS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg",
+    ".zip", ".doc", ".docx", ".xls", ".xlsx", ".mp4",
+)
 
 EMPLOYEE_TRANSPORT_URL = "https://transport-fc.pl/employee-transport.html"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
 
 # ──────────────────────────────────────────────────────────────────────────────
 # OSM helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
-# fragment  "#map=19/<lat>/<lon>"
-OSM_MAP_FRAG = re.compile(r'(?:^|&)map=\d+/([+-]?[0-9.]+)/([+-]?[0-9.]+)(?:&|$)')
+# both OSM link shapes in one pass, anchored to the real query / fragment:
+#   "?...mlat=<lat>&...mlon=<lon>" (either order)  -> groups 1,2 / 4,3
+#   "#...map=19/<lat>/<lon>"                        -> groups 5,6
+# mlat/mlon must be well-formed numbers, so a broken pair falls through to the fragment;
+# "+" and "%20" around the number are the spaces parse_qs used to decode, and the sign and
+# decimal separator may be percent-encoded too (%2B / %2D, %2C / %2E)
+_LL_SEP = r"(?:[.,]|%2[CcEe])"
+_LL_NUM = (
+    r"(?:%20|\+)*"
+    rf"((?:[+-]|%2[BbDd])?(?:\d+(?:{_LL_SEP}\d*)?|{_LL_SEP}\d+))"
+    r"(?:%20|\+)*(?=[&#]|$)"
+)
+OSM_LATLON_RE = re.compile(
+    r"^[^?#]*\?(?:[^#]*?&)?(?:"
+    rf"mlat={_LL_NUM}&(?:[^#]*?&)?mlon={_LL_NUM}"
+    rf"|mlon={_LL_NUM}&(?:[^#]*?&)?mlat={_LL_NUM})"
+    r"|^[^#]*#(?:.*?&)?map=\d+/([+-]?[0-9.]+)/([+-]?[0-9.]+)(?:&|$)"
+)
 LATLON_INLINE = re.compile(
     r"(?P<lat>[+-]?\d{1,2}[.,]\d{4,})\s*[,;/\s]\s*(?P<lon>[+-]?\d{1,3}[.,]\d{4,})"
 )
 TIME_RE = re.compile(r"\b\d{1,2}[:.]\d{2}\b")
+WS_RE = re.compile(r"\s+")
+# HH:MM next to an OSM anchor, searched in its nearest row-like container
+ROW_TIME_RE = re.compile(r"\b\d{1,2}:\d{2}\b")
+ROW_TAGS = frozenset(("tr", "li", "p", "div"))
+# stop-name cleanup: everything except word chars, whitespace and "-" is dropped;
+# ASCII goes through a translate table, the regex only runs for non-ASCII leftovers
+NON_WORD_RE = re.compile(r"[^\w\s-]")
+NON_WORD_ASCII = {c: None for c in range(128) if NON_WORD_RE.match(chr(c))}
+PDF_LEADING_JUNK_RE = re.compile(r"^[\d\W_]+")
+PDF_STOP_WORDS_RE = re.compile(r"\b(przystanek|kierunek|odjazd|przyjazd)\b", re.IGNORECASE)
+OSM_MARKER = "openstreetmap.org"
+OSM_MARKER_BYTES = OSM_MARKER.encode()
+FC_RE = re.compile("|".join(map(re.escape, FC_SUBS)), re.IGNORECASE)
+FC_PRIORITY = {fc: i for i, fc in enumerate(FC_SUBS)}
+FC_TOKEN_RE = re.compile(r"[A-Z]{2,}\d+")
+PDF_EXT_RE = re.compile(r"\.pdf$", re.IGNORECASE)
+# netloc of an absolute http(s) url, without a urlsplit per link
+HTTP_NETLOC_RE = re.compile(r"https?://([^/?#]*)")
+# <a ... href="...openstreetmap.org..."> on raw HTML, before building a DOM
+OSM_ANCHOR_RE = re.compile(
+    r"""<a\s[^>]*?href\s*=\s*["']?\s*[^"'\s>]*openstreetmap\.org""",
+    re.IGNORECASE,
+)
 
-def extract_latlon(href: str):
-    s = href.strip()
-    s = re.sub(r'\s+', '', s)
-    parts = urlsplit(s)
+def _ll_float(v: str) -> float:
+    return float(unquote(v).replace(',', '.'))
 
-    # 1) mlat/mlon в query
-    if parts.query:
-        qs = parse_qs(parts.query)
-        mlat = qs.get('mlat', [None])[0]
-        mlon = qs.get('mlon', [None])[0]
-        if mlat and mlon:
+def extract_latlon(href: str):
+    s = WS_RE.sub('', href)
+
+    # fast path for the usual ".../?mlat=<lat>&mlon=<lon>#map=..." shape, no regex involved
+    q = s.find('?')
+    if q != -1 and s.startswith('mlat=', q + 1) and s.find('#', 0, q) == -1:
+        amp = s.find('&', q)
+        if amp != -1 and s.startswith('mlon=', amp + 1) and s.find('#', q, amp) == -1:
+            end = len(s)
+            for sep in '&#':
+                i = s.find(sep, amp + 6)
+                if i != -1 and i < end:
+                    end = i
             try:
-                return float(str(mlat).replace(',', '.')), float(str(mlon).replace(',', '.'))
+                return float(s[q + 6:amp].replace(',', '.')), float(s[amp + 6:end].replace(',', '.'))
             except ValueError:
                 pass
 
+    m = OSM_LATLON_RE.search(s)
+    if not m:
+        return None
+    mlat, mlon, mlon_r, mlat_r, frag_lat, frag_lon = m.groups()
+
+    # 1) mlat/mlon в query
+    if mlat is not None:
+        return _ll_float(mlat), _ll_float(mlon)
+    if mlat_r is not None:
+        return _ll_float(mlat_r), _ll_float(mlon_r)
+
      #map=Z/lat/lon in fragment
-    if parts.fragment:
-        m = OSM_MAP_FRAG.search(parts.fragment)
-        if m:
-            try:
-                return float(m.group(1)), float(m.group(2))
-            except ValueError:
-                pass
-    return None
+    try:
+        return float(frag_lat), float(frag_lon)
+    except ValueError:
+        return None
 
 def extract_latlon_from_text(text: str):
     match = LATLON_INLINE.search(text)
@@ -130,10 +199,13 @@ def extract_latlon_from_text(text: str):
     except ValueError:
         return None
 
+@lru_cache(maxsize=10000)
 def normalize_stop_name(name: str) -> str:
     cleaned = name.replace("–", "-").replace("—", "-")
-    cleaned = re.sub(r"\s+", " ", cleaned).strip().lower()
-    cleaned = re.sub(r"[^\w\s-]", "", cleaned)
+    cleaned = " ".join(cleaned.split()).lower()
+    cleaned = cleaned.translate(NON_WORD_ASCII)
+    if not cleaned.isascii():
+        cleaned = NON_WORD_RE.sub("", cleaned)
     return cleaned
 
 def normalize_geocode_key(text: str) -> str:
@@ -143,32 +215,241 @@ def normalize_geocode_key(text: str) -> str:
 # HTTP / parsing helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
-def get(url: str) -> requests.Response:               
-    r = SESSION.get(url, headers=HEADERS, timeout=25)
-    r.raise_for_status()
-    return r
+FETCH_SEM = asyncio.Semaphore(MAX_CONCURRENCY)
+HOST_SEMS = defaultdict(lambda: asyncio.Semaphore(PER_HOST_CONCURRENCY))
+HOST_LIMITERS: dict[tuple[str, float], AsyncLimiter] = {}
+_HTTP_CACHE: sqlite3.Connection | None = None
+# the cache is used from worker threads (asyncio.to_thread), one statement at a time
+_HTTP_CACHE_LOCK = threading.Lock()
+
+def _build_client() -> aiohttp.ClientSession:
+    # c-ares resolver: lookups don't go through the getaddrinfo thread pool,
+    # and each host is resolved once per run
+    # pool sized to the semaphores, so a request that got its slot never waits for a socket;
+    # every request on this session, geocoder included, holds its HOST_SEMS and FETCH_SEM slots
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENCY,
+        limit_per_host=PER_HOST_CONCURRENCY,
+        resolver=aiohttp.AsyncResolver(),
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL_SEC,
+    )
+    return aiohttp.ClientSession(
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=25),
+        connector=connector,
+    )
+
+async def _host_slot(host: str, interval: float | None = None) -> None:
+    # token bucket of size 1: request starts on one host are `interval`
+    # (REQUEST_DELAY_SEC by default) apart, while different hosts are paced independently
+    if interval is None:
+        interval = REQUEST_DELAY_SEC
+    if interval <= 0:
+        return
+    limiter = HOST_LIMITERS.get((host, interval))
+    if limiter is None:
+        limiter = HOST_LIMITERS[host, interval] = AsyncLimiter(1, interval)
+    await limiter.acquire()
+
+def _http_cache() -> sqlite3.Connection | None:
+    global _HTTP_CACHE
+    if not HTTP_CACHE_ENABLED:
+        return None
+    if _HTTP_CACHE is None:
+        os.makedirs(os.path.dirname(HTTP_CACHE_PATH), exist_ok=True)
+        _HTTP_CACHE = sqlite3.connect(HTTP_CACHE_PATH, check_same_thread=False)
+        # WAL + NORMAL: a commit is an append to the log, not an fsync of the database
+        _HTTP_CACHE.execute("PRAGMA journal_mode=WAL")
+        _HTTP_CACHE.execute("PRAGMA synchronous=NORMAL")
+        _HTTP_CACHE.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, encoding TEXT, body BLOB, fetched_at REAL)"
+        )
+        # caches written before fetched_at existed
+        columns = {row[1] for row in _HTTP_CACHE.execute("PRAGMA table_info(responses)")}
+        if "fetched_at" not in columns:
+            _HTTP_CACHE.execute("ALTER TABLE responses ADD COLUMN fetched_at REAL")
+    return _HTTP_CACHE
+
+def _cache_lookup(url: str) -> tuple | None:
+    with _HTTP_CACHE_LOCK:
+        db = _http_cache()
+        if db is None:
+            return None
+        return db.execute(
+            "SELECT etag, last_modified, encoding, body, fetched_at FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+
+def _cache_store(url: str, etag: str | None, last_modified: str | None, encoding: str | None, body: bytes) -> None:
+    with _HTTP_CACHE_LOCK:
+        db = _http_cache()
+        if db is None:
+            return
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, encoding, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, encoding, body, time.time()),
+            )
+
+def _cache_touch(url: str) -> None:
+    # a 304 revalidates the stored copy: it is fresh again for another TTL
+    with _HTTP_CACHE_LOCK:
+        db = _http_cache()
+        if db is None:
+            return
+        with db:
+            db.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRY_STATUSES
+    return isinstance(e, TRANSIENT_ERRORS)
+
+async def _request(session: aiohttp.ClientSession, url: str, handle, interval: float | None = None, **kwargs):
+    # every outgoing GET goes through here: per-host and global slots, host pacing,
+    # retries with backoff on RETRY_STATUSES / TRANSIENT_ERRORS.
+    # `handle` reads the response inside the retry loop, so a connection dropped
+    # mid-body is retried as well; its result is returned
+    host = urlsplit(url).netloc
+    async with HOST_SEMS[host]:
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                async with FETCH_SEM:
+                    # paced once a connection is free, so requests that queued on
+                    # FETCH_SEM together still start `interval` apart
+                    await _host_slot(host, interval)
+                    async with session.get(url, **kwargs) as r:
+                        if r.status not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                            r.raise_for_status()
+                            return await handle(r)
+            except TRANSIENT_ERRORS:
+                if attempt == RETRY_TOTAL:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF_SEC * 2 ** attempt)
+
+async def _fetch_body(session: aiohttp.ClientSession, url: str, cached: tuple | None) -> tuple[bytes, str | None]:
+    # conditional GET: an unchanged page comes back as 304 and is served from the on-disk cache
+    headers = {}
+    if cached:
+        etag, last_modified = cached[:2]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    async def read(r: aiohttp.ClientResponse) -> tuple[bytes, str | None]:
+        # sqlite work (a full body BLOB per page or PDF) runs off the event loop
+        if cached and r.status == 304:
+            await asyncio.to_thread(_cache_touch, url)
+            return cached[3], cached[2]
+        body = await r.read()
+        await asyncio.to_thread(
+            _cache_store, url, r.headers.get("ETag"), r.headers.get("Last-Modified"), r.charset, body
+        )
+        return body, r.charset
+
+    return await _request(session, url, read, headers=headers)
 
-def load_geocode_cache(path: str) -> dict:
+async def aget(session: aiohttp.ClientSession, url: str, binary: bool = False) -> str | bytes:
+    cached = await asyncio.to_thread(_cache_lookup, url)
+    if cached and cached[4] and time.time() - cached[4] < HTTP_CACHE_TTL_SEC:
+        body, encoding = cached[3], cached[2]
+    else:
+        try:
+            body, encoding = await _fetch_body(session, url, cached)
+        except Exception as e:
+            # stale-if-error: while a host is down or failing, its last good copy is used
+            if not (cached and _is_transient(e)):
+                raise
+            print(f"[cache] {url}: {e}; using cached copy")
+            body, encoding = cached[3], cached[2]
+
+    if binary:
+        return body
+    try:
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+async def aprobe(session: aiohttp.ClientSession, url: str, marker: bytes, limit: int = OSM_PROBE_BYTES) -> bool:
+    # "does this page mention `marker`?" without downloading it: non-HTML is rejected on
+    # Content-Type, HTML is streamed only until the marker shows up or `limit` bytes are read
+    if await asyncio.to_thread(_cache_lookup, url):
+        # a 304 against the cached copy is cheaper than any partial read
+        return marker in await aget(session, url, binary=True)
+
+    async def scan(r: aiohttp.ClientResponse) -> bool:
+        if r.content_type.startswith(NON_HTML_TYPES):
+            return False
+        buf = bytearray()
+        async for chunk in r.content.iter_chunked(16384):
+            start = max(0, len(buf) - len(marker) + 1)
+            buf += chunk
+            if buf.find(marker, start) != -1:
+                return True
+            if limit and len(buf) >= limit:
+                break
+        return False
+
+    headers = {"Range": f"bytes=0-{limit - 1}"} if limit else {}
+    return await _request(session, url, scan, headers=headers)
+
+if orjson is not None:
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    json_loads = orjson.loads
+else:
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    json_loads = json.loads
+
+def load_json_cache(path: str) -> dict:
     if not os.path.exists(path):
         return {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = json_loads(f.read())
             return data if isinstance(data, dict) else {}
     except Exception:
         return {}
 
-def save_geocode_cache(path: str, cache: dict) -> None:
+def save_json_cache(path: str, cache: dict) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
-
-def geocode_query(query: str, cache: dict, cache_key: str) -> tuple[float, float] | None:
+    with open(path, "wb") as f:
+        f.write(json_dumps(cache))
+
+def dump_json_streamed(path: str, obj: dict) -> None:
+    # Same bytes as json_dumps(obj), but top-level lists are
+    # written one element at a time, so the full indented document never sits in memory.
+    # Written to a .tmp sibling and renamed, so readers never see a half-written file.
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"{")
+        for i, (key, value) in enumerate(obj.items()):
+            f.write(b",\n  " if i else b"\n  ")
+            f.write(json_dumps(key) + b": ")
+            if isinstance(value, list) and value:
+                f.write(b"[")
+                for j, item in enumerate(value):
+                    f.write(b",\n    " if j else b"\n    ")
+                    f.write(json_dumps(item).replace(b"\n", b"\n    "))
+                f.write(b"\n  ]")
+            else:
+                f.write(json_dumps(value).replace(b"\n", b"\n  "))
+        f.write(b"\n}" if obj else b"}")
+    os.replace(tmp, path)
+
+async def geocode_query(
+    session: aiohttp.ClientSession, query: str, cache: dict, cache_key: str
+) -> tuple[float, float] | None:
     if not GEOCODE_ENABLED:
         return None
     if cache_key in cache:
         cached = cache[cache_key]
-        if isinstance(cached, dict) and "lat" in cached and "lon" in cached:
+        # negative entries are stored as {"lat": None, "lon": None}
+        if isinstance(cached, dict) and cached.get("lat") is not None and cached.get("lon") is not None:
             return cached["lat"], cached["lon"]
         return None
 
@@ -180,17 +461,16 @@ def geocode_query(query: str, cache: dict, cache_key: str) -> tuple[float, float
         "countrycodes": "pl",
     }
     try:
-        resp = SESSION.get(
-            "https://nominatim.openstreetmap.org/search",
-            params=params,
-            headers=HEADERS,
-            timeout=25,
+        # Nominatim allows 1 req/s; only real network calls are paced, cache hits return above
+        data = await _request(
+            session, NOMINATIM_URL, lambda r: r.json(content_type=None),
+            interval=GEOCODE_DELAY_SEC, params=params,
         )
-        resp.raise_for_status()
-        data = resp.json()
     except Exception as exc:
         print(f"[geocode] fail {query}: {exc}")
-        cache[cache_key] = {"lat": None, "lon": None}
+        # a rate limit or outage says nothing about the query: leave it for the next run
+        if not _is_transient(exc):
+            cache[cache_key] = {"lat": None, "lon": None}
         return None
 
     if not data:
@@ -205,10 +485,11 @@ def geocode_query(query: str, cache: dict, cache_key: str) -> tuple[float, float
         return None
 
     cache[cache_key] = {"lat": lat, "lon": lon}
-    time.sleep(GEOCODE_DELAY_SEC)
     return lat, lon
 
-def geocode_stop_with_fallback(stop_name: str, route_hint: str | None, cache: dict) -> tuple[float, float] | None:
+async def geocode_stop_with_fallback(
+    session: aiohttp.ClientSession, stop_name: str, route_hint: str | None, cache: dict
+) -> tuple[float, float] | None:
     if not GEOCODE_ENABLED:
         return None
 
@@ -221,66 +502,82 @@ def geocode_stop_with_fallback(stop_name: str, route_hint: str | None, cache: di
 
     for query in queries:
         key = normalize_geocode_key(query)
-        coords = geocode_query(query, cache, key)
+        coords = await geocode_query(session, query, cache, key)
         if coords:
             return coords
     return None
 
+def _canon(u: str) -> str:
+    # one spelling per page: lower-case host, no fragment, no trailing slash;
+    # runs on every in-host link, so absolute http(s) urls are sliced instead of urlsplit
+    u = u.partition("#")[0]
+    m = HTTP_NETLOC_RE.match(u)
+    # urlsplit drops tabs/newlines and reads "http:////x" as host "x": leave those to it
+    if m is None or not m.group(1) or "\t" in u or "\n" in u or "\r" in u:
+        p = urlsplit(u)
+        return urlunsplit((p.scheme, p.netloc.lower(), p.path.rstrip("/"), p.query, ""))
+    path, _, query = u[m.end():].partition("?")
+    return u[:m.start(1)] + m.group(1).lower() + path.rstrip("/") + ("?" + query if query else "")
+
+def _link_map(html: str, base_url: str, host: str, content_only: bool = False) -> dict[str, dict]:
+    # in-host links keyed by canonical url, so "/x", "/x/" and "/x#y" collapse; first link wins
+    tree = LexborHTMLParser(html)
+    scope = tree.css_first(".entry-content") if content_only else tree
+    scope = scope or tree
+    out = {}
+    for a in scope.css("a[href]"):
+        href = urljoin(base_url, a.attributes.get("href") or "")
+        m = HTTP_NETLOC_RE.match(href)
+        if m and m.group(1).endswith(host):
+            key = _canon(href)
+            if key not in out:
+                out[key] = {"title": a.text(strip=True), "url": href}
+    return out
+
 def _links(html: str, base_url: str, host: str, content_only: bool = False):
-    soup = BS(html, "html.parser")
-    scope = soup.select_one(".entry-content") if content_only else soup
-    scope = scope or soup
-    out = []
-    for a in scope.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
-        if href.startswith("http") and urlsplit(href).netloc.endswith(host):
-            out.append({"title": a.get_text(strip=True), "url": href})
-    # дедуп
-    return list({x["url"]: x for x in out}.values())
+    return list(_link_map(html, base_url, host, content_only).values())
 
 def _page_has_osm(html: str) -> bool:
-    return "openstreetmap.org" in html
+    return OSM_MARKER in html
 
-def _extract_pdf_links(html: str, base_url: str) -> list[dict]:
-    soup = BS(html, "html.parser")
-    out = []
-    for a in soup.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
+def _extract_pdf_links(tree: LexborHTMLParser, base_url: str) -> list[dict]:
+    out = {}   # keyed by url: first position, last title wins
+    for a in tree.css("a[href]"):
+        href = urljoin(base_url, a.attributes.get("href") or "")
         if href.lower().endswith(".pdf"):
-            out.append({
-                "title": a.get_text(strip=True),
+            out[href] = {
+                "title": a.text(strip=True),
                 "url": href,
-            })
-    return list({x["url"]: x for x in out}.values())
-
-def parse_employee_transport_links(html: str, base_url: str) -> list[dict]:
-    soup = BS(html, "html.parser")
-    out = []
-    for site in soup.select(".site"):
-        label_node = site.select_one("button span")
-        label_text = label_node.get_text(strip=True) if label_node else ""
-        for a in site.select(".routes a[href]"):
-            href = urljoin(base_url, a["href"])
+            }
+    return list(out.values())
+
+def parse_employee_transport_links(tree: LexborHTMLParser, base_url: str) -> list[dict]:
+    out = {}   # keyed by url: first position, last title wins
+    for site in tree.css(".site"):
+        label_node = site.css_first("button span")
+        label_text = label_node.text(strip=True) if label_node is not None else ""
+        for a in site.css(".routes a[href]"):
+            href = urljoin(base_url, a.attributes.get("href") or "")
             if not href.lower().endswith(".pdf"):
                 continue
-            out.append({
-                "title": a.get_text(strip=True),
+            out[href] = {
+                "title": a.text(strip=True),
                 "url": href,
                 "fc_label": label_text,
-            })
-    return list({x["url"]: x for x in out}.values())
+            }
+    return list(out.values())
 
 def detect_fc_from_text(text: str) -> str | None:
-    lowered = text.lower()
-    for fc in FC_SUBS:
-        if fc in lowered:
-            return fc.upper()
-    return None
+    # one case-insensitive scan; when several codes occur, FC_SUBS order still decides
+    found = {m.lower() for m in FC_RE.findall(text)}
+    if not found:
+        return None
+    return min(found, key=FC_PRIORITY.__getitem__).upper()
 
 def normalize_fc_label(text: str | None) -> str | None:
     if not text:
         return None
-    tokens = re.findall(r"[A-Z]{2,}\d+", text.upper())
+    tokens = FC_TOKEN_RE.findall(text.upper())
     for token in tokens:
         if token.lower() in FC_SUBS:
             return token
@@ -290,7 +587,7 @@ def normalize_fc_label(text: str | None) -> str | None:
 
 def infer_route_title_from_pdf(url: str, first_lines: list[str], link_title: str | None = None) -> str:
     filename = os.path.basename(urlsplit(url).path)
-    base = re.sub(r"\.pdf$", "", unquote(filename), flags=re.IGNORECASE)
+    base = PDF_EXT_RE.sub("", unquote(filename))
     base = base.replace("_", " ").replace("-", " ").strip()
     if link_title and link_title.strip():
         return link_title.strip()
@@ -319,7 +616,7 @@ def parse_pdf_stop_lines(text: str) -> list[dict]:
         "zmiany transportowe",
     )
     for raw_line in text.splitlines():
-        line = re.sub(r"\s+", " ", raw_line).strip()
+        line = " ".join(raw_line.split())
         if not line:
             continue
         if len(line) < 3:
@@ -342,9 +639,9 @@ def parse_pdf_stop_lines(text: str) -> list[dict]:
         if latlon:
             name_part = LATLON_INLINE.sub("", name_part)
 
-        name_part = re.sub(r"\s+", " ", name_part)
-        name_part = re.sub(r"^[\d\W_]+", "", name_part)
-        name_part = re.sub(r"\b(przystanek|kierunek|odjazd|przyjazd)\b", "", name_part, flags=re.IGNORECASE)
+        name_part = " ".join(name_part.split())
+        name_part = PDF_LEADING_JUNK_RE.sub("", name_part)
+        name_part = PDF_STOP_WORDS_RE.sub("", name_part)
         name_part = name_part.strip(" -–:;|")
         if not name_part or len(name_part) < 3:
             continue
@@ -357,113 +654,171 @@ def parse_pdf_stop_lines(text: str) -> list[dict]:
     return stops
 
 def build_prev_stop_index(prev_stops: list[dict] | None) -> dict:
-    index = defaultdict(list)
+    # flat lookups instead of per-name candidate lists:
+    #   (name, fc)   -> (lat, lon) of the first stop with that name on that FC
+    #   (name, None) -> (lat, lon) of the first stop with that name on any FC
+    index = {}
     if not prev_stops:
         return index
     for stop in prev_stops:
         name = normalize_stop_name(stop.get("stop_name", ""))
         if not name:
             continue
-        entry = {"lat": stop.get("lat"), "lon": stop.get("lon"), "fc": stop.get("fc")}
-        if entry["lat"] is None or entry["lon"] is None:
+        lat, lon = stop.get("lat"), stop.get("lon")
+        if lat is None or lon is None:
             continue
-        index[name].append(entry)
+        index.setdefault((name, None), (lat, lon))
+        if stop.get("fc"):
+            index.setdefault((name, stop["fc"]), (lat, lon))
     return index
 
 def resolve_stop_coordinates(
     stop_name: str,
     fc_label: str | None,
     prev_index: dict,
-    geocode_cache: dict,
     inline_latlon: tuple[float, float] | None,
-    route_hint: str | None,
 ) -> tuple[float, float] | None:
     if inline_latlon:
         return inline_latlon
 
     norm = normalize_stop_name(stop_name)
-    if norm in prev_index:
-        candidates = prev_index[norm]
-        if fc_label:
-            for item in candidates:
-                if item.get("fc") == fc_label:
-                    return item["lat"], item["lon"]
-        return candidates[0]["lat"], candidates[0]["lon"]
+    if fc_label and (norm, fc_label) in prev_index:
+        return prev_index[(norm, fc_label)]
+    return prev_index.get((norm, None))
 
-    return geocode_stop_with_fallback(stop_name, route_hint, geocode_cache)
+async def _fetch_page(session: aiohttp.ClientSession, url: str) -> str | None:
+    try:
+        return await aget(session, url)
+    except Exception as e:
+        print(f"[crawl] fail {url}: {e}")
+        return None
 
-def _bfs_collect(host_base: str, seeds: list[str]) -> list[dict]:
+async def _bfs_collect(session: aiohttp.ClientSession, host_base: str, seeds: list[str]) -> list[dict]:
     host = urlsplit(host_base).netloc
-    seen = set()
-    queue = deque([(u, 0) for u in seeds])
     kept = []
-
-    while queue and len(seen) < MAX_PAGES_PER_HOST:
-        url, depth = queue.popleft()
-        u = url.rstrip("/")
-        if u in seen:
+    # canonical url <-> small int; url_ids doubles as the visited set and the
+    # frontier carries ids instead of url strings
+    url_ids: dict[str, int] = {}
+    urls: list[str] = []
+
+    # pages are fetched as soon as they are discovered, but expanded strictly in
+    # BFS order, so the visit order (and the page cap) does not depend on timing
+    frontier = deque()
+
+    def schedule(u: str, depth: int) -> None:
+        if u in url_ids or len(urls) >= MAX_PAGES_PER_HOST:
+            return
+        url_ids[u] = len(urls)
+        urls.append(u)
+        # the last level is only checked for OSM links: probe it instead of downloading it
+        if depth >= MAX_DEPTH:
+            fetch = _has_osm(session, u)
+        else:
+            fetch = _fetch_page(session, u)
+        frontier.append((url_ids[u], depth, asyncio.create_task(fetch)))
+
+    for u in seeds:
+        schedule(_canon(u), 0)
+
+    while frontier:
+        uid, depth, task = frontier.popleft()
+        u = urls[uid]
+        result = await task
+        if depth >= MAX_DEPTH:
+            if result:
+                kept.append({"title": "", "url": u})
             continue
-        seen.add(u)
-        try:
-            resp = get(u)
-            html = resp.text
-        except Exception as e:
-            print(f"[crawl] fail {u}: {e}")
+        if result is None:
             continue
-
-        if _page_has_osm(html):
+        if _page_has_osm(result):
             kept.append({"title": "", "url": u})
-
-        if depth < MAX_DEPTH:
-            for link in _links(html, u, host, content_only=False):
-                v = link["url"].rstrip("/")
-                if v in seen:
-                    continue
-                if any(seg in v for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
-                    continue
-                queue.append((v, depth + 1))
-
-        time.sleep(0.15)
-
-    return list({x["url"]: x for x in kept}.values())
-
-def scrape_employee_transport_pdfs(prev_index: dict, geocode_cache: dict) -> list[dict]:
+        # keys are already canonical
+        for v in _link_map(result, u, host):
+            if any(seg in v for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
+                continue
+            schedule(v, depth + 1)
+
+    # every url is scheduled once, so kept is already unique
+    return kept
+
+def _pdf_text(pdf_bytes: bytes) -> str:
+    texts = []
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            # pages without glyphs (scans, separators) skip the layout/clustering pass
+            texts.append(page.extract_text() or "" if page.chars else "")
+            # release the page's parsed objects before moving on
+            page.close()
+    return "\n".join(texts)
+
+async def scrape_employee_transport_pdfs(
+    session: aiohttp.ClientSession, prev_index: dict, geocode_cache: dict, pdf_text_cache: dict
+) -> list[dict]:
     try:
-        html = get(EMPLOYEE_TRANSPORT_URL).text
+        html = await aget(session, EMPLOYEE_TRANSPORT_URL)
     except Exception as e:
         print(f"[employee-transport] fetch error: {e}")
         return []
 
-    pdf_links = parse_employee_transport_links(html, EMPLOYEE_TRANSPORT_URL)
+    # parsed once; the generic PDF-link scan reuses the tree when the structured one finds nothing
+    tree = LexborHTMLParser(html)
+    pdf_links = parse_employee_transport_links(tree, EMPLOYEE_TRANSPORT_URL)
     if not pdf_links:
-        pdf_links = _extract_pdf_links(html, EMPLOYEE_TRANSPORT_URL)
+        pdf_links = _extract_pdf_links(tree, EMPLOYEE_TRANSPORT_URL)
     if not pdf_links:
         print("[employee-transport] no PDF links found")
         return []
 
-    routes = []
-    for link in pdf_links:
+    pdf_links = [
+        link for link in pdf_links
+        if not (link.get("title") and "zmiany" in link["title"].lower())
+        and "zmiany" not in link["url"].lower()
+    ]
+    downloads = await asyncio.gather(
+        *(aget(session, link["url"], binary=True) for link in pdf_links),
+        return_exceptions=True,
+    )
+
+    # identical PDF bytes as on a previous run: reuse the extracted text
+    digests = [
+        None if isinstance(pdf_bytes, Exception) else hashlib.sha256(pdf_bytes).hexdigest()
+        for pdf_bytes in downloads
+    ]
+    todo = {
+        digest: pdf_bytes for digest, pdf_bytes in zip(digests, downloads)
+        if digest and digest not in pdf_text_cache
+    }
+    parse_errors = {}
+    if todo:
+        # pdfplumber is pure Python and CPU-bound: spread the documents over all cores
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            texts = await asyncio.gather(
+                *(loop.run_in_executor(pool, _pdf_text, pdf_bytes) for pdf_bytes in todo.values()),
+                return_exceptions=True,
+            )
+        for digest, text in zip(todo, texts):
+            if isinstance(text, Exception):
+                parse_errors[digest] = text
+            else:
+                pdf_text_cache[digest] = text
+
+    # 1) resolve what is known offline (inline coords, previous run); the geocode
+    #    cache stays single-writer in this process
+    parsed = []
+    pending = {}   # (stop_name, route_title) -> coords, filled by the geocoder below
+    for link, pdf_bytes, digest in zip(pdf_links, downloads, digests):
         pdf_url = link["url"]
         link_title = link.get("title")
-        if link_title and "zmiany" in link_title.lower():
+        if isinstance(pdf_bytes, Exception):
+            print(f"[employee-transport] download fail {pdf_url}: {pdf_bytes}")
             continue
-        if "zmiany" in pdf_url.lower():
-            continue
-        try:
-            resp = get(pdf_url)
-            pdf_bytes = resp.content
-        except Exception as e:
-            print(f"[employee-transport] download fail {pdf_url}: {e}")
+        if digest in parse_errors:
+            print(f"[employee-transport] parse fail {pdf_url}: {parse_errors[digest]}")
             continue
 
-        try:
-            with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-                texts = [page.extract_text() or "" for page in pdf.pages]
-        except Exception as e:
-            print(f"[employee-transport] parse fail {pdf_url}: {e}")
-            continue
+        combined = pdf_text_cache[digest]
 
-        combined = "\n".join(texts)
         if not combined.strip():
             print(f"[employee-transport] empty PDF {pdf_url}")
             continue
@@ -483,20 +838,32 @@ def scrape_employee_transport_pdfs(prev_index: dict, geocode_cache: dict) -> lis
             print(f"[employee-transport] no stops parsed for {pdf_url}")
             continue
 
-        stop_rows = []
+        resolved = []
         for entry in stop_entries:
             coords = resolve_stop_coordinates(
                 entry["stop_name"],
                 fc_label if fc_label != "UNKNOWN" else None,
                 prev_index,
-                geocode_cache,
                 entry.get("latlon_inline"),
-                route_title,
             )
             if not coords:
-                print(f"[employee-transport] missing coords for {entry['stop_name']} ({pdf_url})")
-                coords = geocode_stop_with_fallback(entry["stop_name"], route_title, geocode_cache)
+                pending[(entry["stop_name"], route_title)] = None
+            resolved.append((entry, coords))
+        parsed.append((pdf_url, route_title, fc_label, resolved))
+
+    # 2) geocode the remaining names one after another through the paced Nominatim client
+    for stop_name, route_title in pending:
+        pending[(stop_name, route_title)] = await geocode_stop_with_fallback(
+            session, stop_name, route_title, geocode_cache
+        )
+
+    routes = []
+    for pdf_url, route_title, fc_label, resolved in parsed:
+        stop_rows = []
+        for entry, coords in resolved:
+            coords = coords or pending.get((entry["stop_name"], route_title))
             if not coords:
+                print(f"[employee-transport] missing coords for {entry['stop_name']} ({pdf_url})")
                 continue
             lat, lon = coords
             stop_rows.append({
@@ -520,107 +887,134 @@ def scrape_employee_transport_pdfs(prev_index: dict, geocode_cache: dict) -> lis
             "stops": stop_rows,
         })
 
+    # drop texts of PDFs that are no longer published
+    for digest in set(pdf_text_cache) - set(digests):
+        del pdf_text_cache[digest]
+
     return routes
 
-def find_route_pages(fc_sub: str) -> list[dict]:
-    fc = fc_sub.lower()
+async def _has_osm(session: aiohttp.ClientSession, url: str) -> bool:
+    # attachments can't hold an OSM anchor; don't spend a request on them
+    if urlsplit(url).path.lower().endswith(NON_HTML_EXTS):
+        return False
+    try:
+        return await aprobe(session, url, OSM_MARKER_BYTES)
+    except Exception as e:
+        print(f"[crawl] fail {url}: {e}")
+        return False
 
-    if fc in WRO_COMMON:
-        try:
-            html = get(WRO_COMMON_ROZKLADY).text
-            host = urlsplit(WRO_COMMON_ROZKLADY).netloc
-            links = _links(html, WRO_COMMON_ROZKLADY, host, content_only=True)
-            filtered = []
-            base = WRO_COMMON_ROZKLADY.rstrip("/")
-            for x in links:
-                u = x["url"].rstrip("/")
-                if u == base:
-                    continue
-                if any(seg in u for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
-                    continue
-                x["_wro_common"] = True
-                filtered.append(x)
-            print(f"[WRO 1/2/3/4] kept {len(filtered)}")
-            return filtered
-        except Exception as e:
-            print(f"[WRO common] error: {e}")
-            return []
+async def _handle_wro_common(session: aiohttp.ClientSession, fc: str) -> list[dict]:
+    try:
+        html = await aget(session, WRO_COMMON_ROZKLADY)
+        host = urlsplit(WRO_COMMON_ROZKLADY).netloc
+        links = _links(html, WRO_COMMON_ROZKLADY, host, content_only=True)
+        filtered = []
+        base = WRO_COMMON_ROZKLADY.rstrip("/")
+        for x in links:
+            u = x["url"].rstrip("/")
+            if u == base:
+                continue
+            if any(seg in u for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
+                continue
+            x["_wro_common"] = True
+            filtered.append(x)
+        print(f"[WRO 1/2/3/4] kept {len(filtered)}")
+        return filtered
+    except Exception as e:
+        print(f"[WRO common] error: {e}")
+        return []
 
-    if fc == "wro5":
-        try:
-            html = get(WRO5_ROZKLADY).text
-            host = urlsplit(WRO5_ROZKLADY).netloc
-            links = _links(html, WRO5_ROZKLADY, host, content_only=True)
-            filtered = []
-            for x in links:
-                u = x["url"].rstrip("/")
-                if any(seg in u for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
-                    continue
-                filtered.append(x)
-            print(f"[WRO5] kept {len(filtered)}")
-            return filtered
-        except Exception as e:
-            print(f"[WRO5] error: {e}")
-            return []
+async def _handle_wro5(session: aiohttp.ClientSession, fc: str) -> list[dict]:
+    try:
+        html = await aget(session, WRO5_ROZKLADY)
+        host = urlsplit(WRO5_ROZKLADY).netloc
+        links = _links(html, WRO5_ROZKLADY, host, content_only=True)
+        filtered = []
+        for x in links:
+            u = x["url"].rstrip("/")
+            if any(seg in u for seg in ["/category/", "/kategoria/", "/tag/", "/page/"]):
+                continue
+            filtered.append(x)
+        print(f"[WRO5] kept {len(filtered)}")
+        return filtered
+    except Exception as e:
+        print(f"[WRO5] error: {e}")
+        return []
 
-    if fc in LCJ_SEEDS:
-        seeds = LCJ_SEEDS[fc]
-        print(f"[{fc.upper()}] crawl seeds: {', '.join(seeds)}")
-        pages = _bfs_collect(seeds[0], seeds)
-        print(f"[{fc.upper()}] candidates with OSM: {len(pages)}")
-        return pages
+async def _handle_lcj(session: aiohttp.ClientSession, fc: str) -> list[dict]:
+    seeds = LCJ_SEEDS[fc]
+    print(f"[{fc.upper()}] crawl seeds: {', '.join(seeds)}")
+    pages = await _bfs_collect(session, seeds[0], seeds)
+    print(f"[{fc.upper()}] candidates with OSM: {len(pages)}")
+    return pages
 
+async def _handle_root_probe(session: aiohttp.ClientSession, fc: str) -> list[dict]:
     root = f"https://{fc}.transport-fc.eu/"
     try:
-        html = get(root).text
+        html = await aget(session, root)
         host = urlsplit(root).netloc
         links = _links(html, root, host, content_only=False)
-        kept = []
-        for x in links:
-            try:
-                h2 = get(x["url"]).text
-                if _page_has_osm(h2):
-                    kept.append(x)
-            except Exception:
-                pass
-            time.sleep(0.1)
+        flags = await asyncio.gather(*(_has_osm(session, x["url"]) for x in links))
+        kept = [x for x, ok in zip(links, flags) if ok]
         print(f"[{fc.upper()}] kept {len(kept)}")
         return kept
     except Exception as e:
         print(f"[{fc.upper()}] root error: {e}")
         return []
 
-def parse_route_page_with_flag(url: str, fc_sub: str, is_wro_common: bool = False) -> dict | None:
-    html = get(url).text
-    soup = BS(html, "html.parser")
+# how each subdomain lists its route pages; anything else probes its root page
+HANDLERS = {
+    **{sub: _handle_wro_common for sub in WRO_COMMON},
+    "wro5": _handle_wro5,
+    **{sub: _handle_lcj for sub in LCJ_SEEDS},
+}
+
+async def find_route_pages(session: aiohttp.ClientSession, fc_sub: str) -> list[dict]:
+    fc = fc_sub.lower()
+    return await HANDLERS.get(fc, _handle_root_probe)(session, fc)
+
+async def parse_route_page_with_flag(
+    session: aiohttp.ClientSession, url: str, fc_sub: str, is_wro_common: bool = False
+) -> dict | None:
+    html = await aget(session, url)
+    return parse_route_html(html, url, fc_sub, is_wro_common)
+
+def parse_route_html(html: str, url: str, fc_sub: str, is_wro_common: bool = False) -> dict | None:
+    if not OSM_ANCHOR_RE.search(html):
+        print(f"  [warn] no OSM stops on: {url}")
+        return None
+
+    tree = LexborHTMLParser(html)
     stop_rows = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        if "openstreetmap.org" not in href:
-            continue
+    row_times = {}  # row.mem_id -> sorted HH:MM list, so a row with several anchors is scanned once
+    for a in tree.css('a[href*="openstreetmap.org"]'):
+        href = a.attributes.get("href") or ""
         latlon = extract_latlon(href)
         if not latlon:
             continue
         lat, lon = latlon
-        name = a.get_text(strip=True)
-        times = []
-        parent = a.find_parent(["tr", "li", "p", "div"]) or soup
-        for t in re.findall(r"\b\d{1,2}:\d{2}\b", parent.get_text(" ")):
-            times.append(t)
+        name = a.text(strip=True)
+        row = a.parent
+        while row is not None and row.tag not in ROW_TAGS:
+            row = row.parent
+        row = row or tree.root
+        times = row_times.get(row.mem_id)
+        if times is None:
+            times = row_times[row.mem_id] = sorted(set(ROW_TIME_RE.findall(row.text(separator=" "))))
         stop_rows.append({
             "stop_name": name,
             "lat": lat,
             "lon": lon,
             "url": href,
-            "context_times": sorted(set(times)),
+            "context_times": times,
         })
 
     if not stop_rows:
         print(f"  [warn] no OSM stops on: {url}")
         return None
 
-    title = soup.find(["h1", "h2"]) or url
-    route_title = title.get_text(strip=True) if hasattr(title, "get_text") else str(title)
+    title = tree.css_first("h1, h2")
+    route_title = title.text(strip=True) if title is not None else url
     fc_label = "WRO" if is_wro_common else fc_sub.upper()
     slug_prefix = "wro" if is_wro_common else fc_sub
     print(f"  [+] {fc_label}: {route_title} → {len(stop_rows)} stops")
@@ -632,29 +1026,51 @@ def parse_route_page_with_flag(url: str, fc_sub: str, is_wro_common: bool = Fals
         "stops": stop_rows,
     }
 
-def scrape_all(prev_index: dict, geocode_cache: dict) -> list[dict]:
+async def scrape_sub(session: aiohttp.ClientSession, sub: str) -> list[dict]:
+    pages = await find_route_pages(session, sub)
+    results = await asyncio.gather(
+        *(
+            parse_route_page_with_flag(session, p["url"], sub, is_wro_common=p.get("_wro_common", False))
+            for p in pages
+        ),
+        return_exceptions=True,
+    )
     routes = []
-    seen_wro_common = False
+    for p, data in zip(pages, results):
+        if isinstance(data, Exception):
+            print("! Error on", p["url"], data)
+            continue
+        if data:
+            routes.append(data)
+    return routes
 
-    pdf_routes = scrape_employee_transport_pdfs(prev_index, geocode_cache)
-    routes.extend(pdf_routes)
+async def scrape_all(prev_index: dict, geocode_cache: dict, pdf_text_cache: dict) -> list[dict]:
+    routes = []
 
-    for sub in FC_SUBS:
-        if seen_wro_common and sub.lower() in WRO_COMMON:
-            print(f"[skip] duplicate WRO alias: {sub}")
-            continue
+    async with _build_client() as session:
+        # the PDF pipeline is dominated by paced geocoding; run it alongside the crawl
+        pdf_task = asyncio.create_task(
+            scrape_employee_transport_pdfs(session, prev_index, geocode_cache, pdf_text_cache)
+        )
 
-        pages = find_route_pages(sub)
-        for p in pages:
-            try:
-                data = parse_route_page_with_flag(p["url"], sub, is_wro_common=p.get("_wro_common", False))
-                if data:
-                    routes.append(data)
-                    if p.get("_wro_common"):
-                        seen_wro_common = True
-            except Exception as e:
-                print("! Error on", p["url"], e)
-            time.sleep(REQUEST_DELAY_SEC)
+        # WRO 1-4 share one schedule page, so only the first alias is crawled
+        targets = []
+        wro_added = False
+        for sub in FC_SUBS:
+            if sub.lower() in WRO_COMMON:
+                if wro_added:
+                    print(f"[skip] duplicate WRO alias: {sub}")
+                    continue
+                wro_added = True
+            targets.append(sub)
+
+        # subdomains are independent hosts: crawl them concurrently (FETCH_SEM / HOST_SEMS
+        # still cap the load), then keep the routes in FC_SUBS order
+        for found in await asyncio.gather(*(scrape_sub(session, sub) for sub in targets)):
+            routes.extend(found)
+
+        # PDF routes first, as before
+        routes[:0] = await pdf_task
 
     print(f"[done] routes collected: {len(routes)}")
     return routes
@@ -663,17 +1079,21 @@ def scrape_all(prev_index: dict, geocode_cache: dict) -> list[dict]:
 # Diff & export
 # ──────────────────────────────────────────────────────────────────────────────
 
-def load_prev_stops(path: str):
+def load_prev_stops(path: str) -> list[dict] | None:
     if not os.path.exists(path):
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            j = json.load(f)
-            return j.get("stops") if isinstance(j, dict) else None
+        with open(path, "rb") as f:
+            j = json_loads(f.read())
+            # an existing wrapper without stops still gets an (empty) diff report
+            return (j.get("stops") or []) if isinstance(j, dict) else None
     except Exception:
         return None
 
 def make_stop_key(s: dict) -> tuple:
+    # freshly scraped stops carry their key from the flattening pass
+    if "_key" in s:
+        return s["_key"]
     return (
         s.get("fc"),
         s.get("route_slug"),
@@ -685,6 +1105,22 @@ def make_stop_key(s: dict) -> tuple:
 def make_route_key(r: dict) -> tuple:
     return (r.get("fc"), r.get("route_slug"))
 
+def label_route_key(key: tuple) -> dict:
+    fc, route_slug = key
+    return {"fc": fc, "route_slug": route_slug}
+
+def summarize_stop(s: dict) -> dict:
+    return {
+        "fc": s["fc"],
+        "route": s["route"],
+        "route_slug": s["route_slug"],
+        "stop_name": s["stop_name"],
+        "lat": s["lat"],
+        "lon": s["lon"],
+        "source": s.get("source"),
+        "url": s.get("url"),
+    }
+
 def dedupe_stops(stops_list: list[dict]) -> list[dict]:
     seen = set()
     out = []
@@ -700,12 +1136,18 @@ def duplicate_wro_if_needed(stops_list: list[dict]) -> list[dict]:
     if not DUPLICATE_WRO_BY_FC:
         return stops_list
     cloned = []
+    slugs = {}   # (fc, route) -> slug; slugify runs once per route, not per stop
     for s in stops_list:
         if s.get("fc") == "WRO":
             for fc in ("WRO1", "WRO2", "WRO3", "WRO4"):
+                slug = slugs.get((fc, s["route"]))
+                if slug is None:
+                    slug = slugs[fc, s["route"]] = slugify(f"{fc.lower()}-{s['route']}")
                 ss = dict(s)
+                ss.pop("_key", None)
                 ss["fc"] = fc
-                ss["route_slug"] = slugify(f"{fc.lower()}-{s['route']}")
+                ss["route_slug"] = slug
+                ss["_key"] = make_stop_key(ss)
                 cloned.append(ss)
         else:
             cloned.append(s)
@@ -714,23 +1156,14 @@ def duplicate_wro_if_needed(stops_list: list[dict]) -> list[dict]:
 if __name__ == "__main__":
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    prev_wrapper = None
-    if os.path.exists(DATA_PATH):                      
-        try:
-            with open(DATA_PATH, "r", encoding="utf-8") as f:
-                prev_wrapper = json.load(f)
-        except Exception:
-            prev_wrapper = None
-
-    prev = None
-    if prev_wrapper and isinstance(prev_wrapper, dict):
-        prev = prev_wrapper.get("stops")
+    prev = load_prev_stops(DATA_PATH)
 
-    geocode_cache = load_geocode_cache(GEOCODE_CACHE_PATH)
+    geocode_cache = load_json_cache(GEOCODE_CACHE_PATH)
+    pdf_text_cache = load_json_cache(PDF_TEXT_CACHE_PATH)
     prev_index = build_prev_stop_index(prev)
 
     try:
-        routes = scrape_all(prev_index, geocode_cache)
+        routes = asyncio.run(scrape_all(prev_index, geocode_cache, pdf_text_cache))
     except Exception as e:                             
         print("[fatal] scrape_all failed:", e)
         routes = []
@@ -738,91 +1171,87 @@ if __name__ == "__main__":
     all_stops = []
     for r in routes:
         for s in r["stops"]:
-            all_stops.append({
+            stop = {
                 "fc": r["fc"],
                 "route": r["route"],
                 "route_slug": r["route_slug"],
                 "source": r["source"],
                 **s,
-            })
+            }
+            # computed once; dedupe, sort and diff all reuse it. Stripped before saving.
+            stop["_key"] = make_stop_key(stop)
+            all_stops.append(stop)
 
     # 
     all_stops = dedupe_stops(all_stops)
     all_stops = duplicate_wro_if_needed(all_stops)
 
-    def _sort_key(s):
-        return (
-            s.get("fc", ""),
-            s.get("route_slug", ""),
-            s.get("stop_name", ""),
-            round(float(s.get("lat") or 0.0), 6),
-            round(float(s.get("lon") or 0.0), 6),
-        )
-    all_stops.sort(key=_sort_key)
+    # the stop key is also the output order: fc, route, stop name, rounded coordinates
+    all_stops.sort(key=itemgetter("_key"))
+    stop_keys = [s.pop("_key") for s in all_stops]
 
     if not all_stops:
         print("[warn] no stops collected; keep previous data.json as-is")
-        if prev_wrapper:
-            with open(CHANGES_PATH, "w", encoding="utf-8") as f:
-                json.dump({
-                    "generated": time.time(),
-                    "routes_total_new": len({make_route_key({"fc": s["fc"], "route_slug": s["route_slug"]}) for s in prev}) if prev else 0,
-                    "stops_total_new": len(prev) if prev else 0,
-                    "new_routes": [], "removed_routes": [], "new_stops": [], "removed_stops": []
-                }, f, ensure_ascii=False, indent=2)
+        if prev is not None:
+            dump_json_streamed(CHANGES_PATH, {
+                "generated": time.time(),
+                "routes_total_new": len({make_route_key(s) for s in prev}) if prev else 0,
+                "stops_total_new": len(prev) if prev else 0,
+                "new_routes": [], "removed_routes": [], "new_stops": [], "removed_stops": []
+            })
             print(f"Diff report saved to {CHANGES_PATH}")
         raise SystemExit(0)
 
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump({"generated": time.time(), "stops": all_stops}, f, ensure_ascii=False, indent=2)
+    dump_json_streamed(DATA_PATH, {"generated": time.time(), "stops": all_stops})
     print(f"Saved {len(all_stops)} stops to {DATA_PATH}")
 
+    # (N, 2) lat/lon array in stops.json order, so consumers can do distance math vectorised
+    coords = np.fromiter(
+        (v for s in all_stops for v in (s["lat"], s["lon"])),
+        dtype=np.float64,
+        count=2 * len(all_stops),
+    ).reshape(-1, 2)
+    with open(COORDS_PATH + ".tmp", "wb") as f:
+        np.save(f, coords)
+    os.replace(COORDS_PATH + ".tmp", COORDS_PATH)
+
     if geocode_cache:
-        save_geocode_cache(GEOCODE_CACHE_PATH, geocode_cache)
+        save_json_cache(GEOCODE_CACHE_PATH, geocode_cache)
+    if pdf_text_cache:
+        save_json_cache(PDF_TEXT_CACHE_PATH, pdf_text_cache)
 
     changes = {
         "generated": time.time(),
-        "routes_total_new": len({make_route_key({"fc": s["fc"], "route_slug": s["route_slug"]}) for s in all_stops}),
+        "routes_total_new": len({make_route_key(s) for s in all_stops}),
         "stops_total_new": len(all_stops),
         "new_routes": [], "removed_routes": [], "new_stops": [], "removed_stops": [],
     }
 
     if prev is not None:
-        prev_stop_keys = {make_stop_key(s) for s in prev}
-        new_stop_keys  = {make_stop_key(s) for s in all_stops}
+        # key every row once; the key -> row index replaces a linear scan per added/removed key
+        prev_by_key = {}
+        for s in prev:
+            prev_by_key.setdefault(make_stop_key(s), s)
+        new_by_key = {}
+        for key, s in zip(stop_keys, all_stops):
+            new_by_key.setdefault(key, s)
+
+        prev_stop_keys = prev_by_key.keys()
+        new_stop_keys  = new_by_key.keys()
 
         added_stop_keys   = new_stop_keys - prev_stop_keys
         removed_stop_keys = prev_stop_keys - new_stop_keys
 
-        prev_route_keys = {make_route_key({"fc": s["fc"], "route_slug": s["route_slug"]}) for s in prev}
-        new_route_keys  = {make_route_key({"fc": s["fc"], "route_slug": s["route_slug"]}) for s in all_stops}
+        prev_route_keys = {make_route_key(s) for s in prev}
+        new_route_keys  = {make_route_key(s) for s in all_stops}
 
         added_route_keys   = new_route_keys - prev_route_keys
         removed_route_keys = prev_route_keys - new_route_keys
 
-        def find_by_stop_key(pool, key):
-            for s in pool:
-                if make_stop_key(s) == key:
-                    return {
-                        "fc": s["fc"],
-                        "route": s["route"],
-                        "route_slug": s["route_slug"],
-                        "stop_name": s["stop_name"],
-                        "lat": s["lat"],
-                        "lon": s["lon"],
-                        "source": s.get("source"),
-                        "url": s.get("url"),
-                    }
-            return None
-
-        def label_route_key(key):
-            fc, route_slug = key
-            return {"fc": fc, "route_slug": route_slug}
-
         changes["new_routes"]     = [label_route_key(k) for k in sorted(added_route_keys)]
         changes["removed_routes"] = [label_route_key(k) for k in sorted(removed_route_keys)]
-        changes["new_stops"]      = [find_by_stop_key(all_stops, k) for k in sorted(added_stop_keys)]
-        changes["removed_stops"]  = [find_by_stop_key(prev, k) for k in sorted(removed_stop_keys)]
+        changes["new_stops"]      = [summarize_stop(new_by_key[k]) for k in sorted(added_stop_keys)]
+        changes["removed_stops"]  = [summarize_stop(prev_by_key[k]) for k in sorted(removed_stop_keys)]
 
         print("\n=== DIFF vs previous stops.json ===")
         print(f"+ new routes: {len(changes['new_routes'])}")
@@ -830,6 +1259,5 @@ if __name__ == "__main__":
         print(f"+ new stops: {len(changes['new_stops'])}")
         print(f"- removed stops: {len(changes['removed_stops'])}")
 
-    with open(CHANGES_PATH, "w", encoding="utf-8") as f:
-        json.dump(changes, f, ensure_ascii=False, indent=2)
+    dump_json_streamed(CHANGES_PATH, changes)
     print(f"Diff report saved to {CHANGES_PATH}")